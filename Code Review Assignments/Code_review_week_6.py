@@ -42,6 +42,46 @@ def weird_clock(hour_vector, add_minutes):
     new_time="{:0>2}:{:0>2}".format(hh,mm)
     return new_time
 
+
+def weird_clock_vectorized(hour_vectors, add_minutes, output="string"):
+    """
+    This function is the vectorized version of weird_clock(). It converts
+    many hands of a clock at once, with whole-array operations instead of
+    one call of weird_clock() for each of them.
+    
+    Input:
+        hour_vectors: array-like with N rows and 2 columns, each row is a
+            vector representing the hand of a clock.
+        add_minutes: any real number, or an array-like with N real numbers,
+            which is time (unit: minute) that you want to add on the time
+            represented by each row of hour_vectors.
+        output: either "string" or "minutes" to choose the type of the result.
+    
+    Output:
+        new_time: if output is "string", an array of N str in the format
+            "hh:mm", the same as weird_clock() for each row. If output is
+            "minutes", an array of N int, which are the new times (unit: minute)
+            after 12:00, between 0 and 719.
+    """
+    hour_vectors=np.asarray(hour_vectors, dtype=float).reshape(-1, 2)
+    #The angle from [0, 1] (the direction of 12:00) to each hour_vector,
+    #clockwise, is between -pi and pi. The negative angles are the times
+    #after 06:00, so a whole turn (720 minutes) is added to them.
+    degree=np.arctan2(hour_vectors[:, 0], hour_vectors[:, 1])
+    minutes=degree*360/np.pi+np.where(hour_vectors[:, 0]<0, 720, 0)
+    minutes=minutes+np.asarray(add_minutes, dtype=float)
+    #Rounding in the same way as round() (to the nearest even number for
+    #the halves) and converting the minutes to the real time
+    minutes=np.rint(minutes).astype(np.int64)%720
+    if output=="minutes":
+        return minutes
+    mm=minutes%60
+    hh=np.where(minutes==0, 12, minutes//60)
+    #Outputing the times that meet the requirement of format
+    new_time=np.char.add(np.char.add(np.char.zfill(hh.astype(str), 2), ":"),\
+    np.char.zfill(mm.astype(str), 2))
+    return new_time
+
 #The examples for testing
 print(weird_clock([1,0], 15))
 print(weird_clock([-4,-5], 45))
@@ -67,4 +107,12 @@ print(weird_clock([23.56, 76.41], 89.7))
 print(weird_clock([30, -30], 1440))
 print(weird_clock([1/2, -np.sqrt(3)/2], -720))
 print(weird_clock([-np.sqrt(3)/2, -1/2], 60))
-print(weird_clock([-1071, 2315], 42563))
\ No newline at end of file
+print(weird_clock([-1071, 2315], 42563))
+
+#The vectorized version gives the same results as weird_clock() for all
+#the examples above, computed in a single call.
+hour_vectors=[[1,0], [-4,-5], [23,76], [-12,12], [28.34,69.26], [-1,100],\
+[0,2], [0,-5], [23.56, 76.41], [30, -30], [-1071, 2315]]
+add_minutes=[15, 45, 44, 45, 53.34, 25, 30, 45, 89.7, 1440, 42563]
+print(weird_clock_vectorized(hour_vectors, add_minutes))
+print(weird_clock_vectorized(hour_vectors, add_minutes, output="minutes"))
\ No newline at end of file
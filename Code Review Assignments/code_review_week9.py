@@ -1,3 +1,8 @@
+import os
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 def encrypt_it(string):
     '''
     This is the function that takes an input string, and returns the encrypted version of it.
@@ -68,6 +73,211 @@ def decrypt_it(string):
     return string
 
 
+
+def split_words(chunks):
+    '''
+    This is the generator that takes an iterable of pieces of text (e.g. the lines of a file, or blocks of a fixed
+    size), and yields the words of the whole text in lists, one list for each piece.
+
+    Input:
+        chunks (iterable): the pieces of the text, which are joined as they are (lines keep their '\n')
+
+    Output:
+        words (list): the complete words found so far. A word cut between two pieces is only yielded
+            with the next piece, and the last word is always yielded at the end (even if it is empty)
+    '''
+    # The end of the previous piece, which may be the start of a word cut between two pieces
+    partial = ''
+    for chunk in chunks:
+        words = (partial + chunk).split(' ')
+        partial = words.pop()
+        if words:
+            yield words
+    yield [partial]
+
+
+def swap_pairs(batches):
+    '''
+    This is the generator that swaps the words 0 and 1, 2 and 3, etc. over a stream of lists of words.
+    A word which has no partner yet in its list is kept until the next list.
+    '''
+    carry = []
+    for words in batches:
+        words = carry + words
+        # Keep the last word if the number of words is odd, unless it is the last list
+        carry = words[-1: ] if len(words) % 2 == 1 else []
+        words = words[ :len(words) - len(carry)]
+        words[0::2], words[1::2] = words[1::2], words[0::2]
+        if words:
+            yield words
+    if carry:
+        yield carry
+
+
+def read_chunks(path, chunk_size = 1 << 20):
+    '''
+    This is the generator that reads a text file in blocks of `chunk_size` characters.
+    '''
+    with open(path, 'r', encoding = 'utf-8', newline = '') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def last_first_letter(chunks):
+    '''
+    This is the function that takes the pieces of an original text, and returns the first letter of the last word
+    after the words are re-ordered, which becomes the first letter of the first word in the encrypted text.
+    Only the last two words and the parity of the number of words are kept, so the memory used is bounded.
+    '''
+    n = 0
+    last_two = ['', '']
+    for words in split_words(chunks):
+        n += len(words)
+        # Only the word 'I' itself is turned into 'i', so this is done on the whole word before keeping its first letter
+        last_two = (last_two + [(word if word != 'I' else 'i')[ :1] for word in words[-2: ]])[-2: ]
+    # The last word is the last original word if the number of words is odd, and the one before it otherwise
+    return last_two[1] if n % 2 == 1 else last_two[0]
+
+
+def encrypt_stream(chunks, first_letter):
+    '''
+    This is the generator that encrypts a text given in pieces, with the same result as `encrypt_it` on the whole
+    text, keeping only one piece in memory at a time.
+
+    Input:
+        chunks (iterable): the pieces of the original text
+        first_letter (str): the first letter of the first encrypted word, returned by `last_first_letter`
+            (it depends on the end of the text, so the text has to be read twice)
+
+    Output:
+        pieces (str): the pieces of the encrypted text, which are simply joined to get the whole text
+    '''
+    previous_letter = first_letter
+    separator = ''
+    for words in swap_pairs(split_words(chunks)):
+        # The word 'I' is turned into 'i' before anything else, but only its first letter matters after swapping
+        words = [word if word != 'I' else 'i' for word in words]
+        # Replace the first letter of each word with the first letter of the previous word,
+        # and reverse the order of all the letters excluding the first letter
+        first_letters = [previous_letter] + [word[0] for word in words[ :-1]]
+        previous_letter = words[-1][0]
+        yield separator + ' '.join([letter + word[ :0 :-1] for letter, word in zip(first_letters, words)])
+        separator = ' '
+
+
+def decrypt_stream(chunks):
+    '''
+    This is the generator that decrypts a text given in pieces, with the same result as `decrypt_it` on the whole
+    text, keeping only one piece in memory at a time. The text only needs to be read once.
+
+    Input:
+        chunks (iterable): the pieces of the encrypted text
+
+    Output:
+        pieces (str): the pieces of the original text, which are simply joined to get the whole text
+    '''
+    def restore_words(batches):
+        '''
+        Restores each word with the first letter of the next word, keeping the last word until the next list.
+        The last word of the text takes the first letter of the first word.
+        '''
+        held = []
+        first_letter = None
+        for words in batches:
+            words = held + words
+            if first_letter is None:
+                first_letter = words[0][0]
+            held = words[-1: ]
+            restored = [following[0] + word[ :0 :-1] for word, following in zip(words[ :-1], words[1: ])]
+            if restored:
+                yield restored
+        yield [first_letter + held[0][ :0 :-1]]
+
+    separator = ''
+    for words in swap_pairs(restore_words(split_words(chunks))):
+        yield separator + ' '.join([word if word != 'i' else 'I' for word in words])
+        separator = ' '
+
+
+def encrypt_lines(lines):
+    '''
+    This is the generator that encrypts a text given as any iterable of pieces (e.g. the lines of a file),
+    which may be read only once. The pieces are copied to a temporary file while reading them, so that the
+    text can be read a second time without keeping it in memory.
+    '''
+    with tempfile.TemporaryFile('w+', encoding = 'utf-8', newline = '') as spool:
+        def copy(chunks):
+            for chunk in chunks:
+                spool.write(chunk)
+                yield chunk
+        first_letter = last_first_letter(copy(lines))
+        spool.seek(0)
+        yield from encrypt_stream(iter(lambda: spool.read(1 << 20), ''), first_letter)
+
+
+def encrypt_file(source, destination, chunk_size = 1 << 20):
+    '''
+    This is the function that encrypts the text file `source` into the file `destination` in bounded memory.
+    It returns the size of the file read (in bytes).
+    '''
+    first_letter = last_first_letter(read_chunks(source, chunk_size))
+    with open(destination, 'w', encoding = 'utf-8', newline = '') as f:
+        for piece in encrypt_stream(read_chunks(source, chunk_size), first_letter):
+            f.write(piece)
+    return os.path.getsize(source)
+
+
+def decrypt_file(source, destination, chunk_size = 1 << 20):
+    '''
+    This is the function that decrypts the text file `source` into the file `destination` in bounded memory.
+    It returns the size of the file read (in bytes).
+    '''
+    with open(destination, 'w', encoding = 'utf-8', newline = '') as f:
+        for piece in decrypt_stream(read_chunks(source, chunk_size)):
+            f.write(piece)
+    return os.path.getsize(source)
+
+
+def encrypt_batch(sources, destinations, decrypt = False, workers = None):
+    '''
+    This is the function that encrypts (or decrypts) many text files at the same time in several processes,
+    each file being processed with `encrypt_file` (or `decrypt_file`). It returns the total size of the files read.
+    '''
+    function = decrypt_file if decrypt else encrypt_file
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        return sum(executor.map(function, sources, destinations))
+
+
+def benchmark_it(size_mb = 8, files = 4, workers = None):
+    '''
+    This is the function that measures the throughput (in MB/s) of the streaming functions on a random corpus
+    of `files` files of `size_mb` MB in total, in one process and in several processes, and checks that
+    decrypting the encrypted files gives back the original files.
+    '''
+    vocabulary = ['I', 'a', 'am', 'python', 'programming', 'is', 'fun,', 'but', 'tired', 'of', 'in', 'the', 'world.\n']
+    with tempfile.TemporaryDirectory() as directory:
+        sources = [os.path.join(directory, 'corpus_{}.txt'.format(k)) for k in range(files)]
+        encrypted = [path + '.enc' for path in sources]
+        decrypted = [path + '.dec' for path in sources]
+        for (k, path) in enumerate(sources):
+            words = [vocabulary[(i * 7 + k) % len(vocabulary)] for i in range(size_mb * 2 ** 20 // files // 5)]
+            with open(path, 'w', encoding = 'utf-8', newline = '') as f:
+                f.write(' '.join(words))
+        start = time.perf_counter()
+        size = sum(encrypt_file(source, destination) for source, destination in zip(sources, encrypted))
+        single = size / 2 ** 20 / (time.perf_counter() - start)
+        start = time.perf_counter()
+        size = encrypt_batch(sources, encrypted, workers = workers)
+        batch = size / 2 ** 20 / (time.perf_counter() - start)
+        encrypt_batch(encrypted, decrypted, decrypt = True, workers = workers)
+        correct = all(open(a, encoding = 'utf-8', newline = '').read() == open(b, encoding = 'utf-8', newline = '').read()
+                      for a, b in zip(sources, decrypted))
+    return {'single process (MB/s)': round(single, 2), 'batch (MB/s)': round(batch, 2), 'round trip': correct}
+
+
 # Testing examples
 
 # The original message from the future
@@ -103,3 +313,17 @@ print(encrypt_it('encrypt'))
 print(decrypt_it('etpyrcn'))
 print(encrypt_it('Brilliant invention'))
 print(decrypt_it('Bnoitnevn itnaillir'))
+
+
+# The streaming versions give the same results as the functions on the whole string, even when
+# the text is cut in the middle of the words
+text = 'If you wish to succeed, you should use persistence as your friend, experience as your reference, prudence as your brother and hope as your sentry.'
+chunks = [text[i: i + 5] for i in range(0, len(text), 5)]
+print(''.join(encrypt_lines(chunks)) == encrypt_it(text))
+print(''.join(decrypt_stream([encrypt_it(text)[i: i + 3] for i in range(0, len(text), 3)])) == text)
+# The words starting with 'I' (other than 'I' itself) keep their capital letter, also at the end of a line
+for text in ['Is it', 'It is In', 'This course is fun, but I am tired of programming in Python!', 'you and I\nIt is', 'and I']:
+    print(''.join(encrypt_lines(text.splitlines(True))) == encrypt_it(text))
+
+if __name__ == '__main__':
+    print(benchmark_it())
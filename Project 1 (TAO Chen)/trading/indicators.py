@@ -1,12 +1,186 @@
 import numpy as np
 
+# The rolling-window kernels. All the indicators below share the same rule for the first n-1 days: on the day k
+# (1 <= k <= n-1), the window only contains the first k days. This is also the case for all the days when the
+# number of days is less than n. The kernels work on one column (1-D) or on several columns (2-D, one column
+# for each stock) at the same time.
+
+def rolling_window(data, n, pad = np.nan):
+    '''
+    Returns a view of the windows of the last n days up to every day, without copying the data.
+
+    Input:
+        data (ndarray): the values over time, with one row for each day
+        n (int): the length of the window (in days)
+        pad (float or str, default NaN): the value put before the first day to fill the windows of
+            the first n-1 days. If 'first', the values of the first day are repeated.
+
+    Output:
+        windows (ndarray): an array with one more axis than `data`, such that windows[i, ..., :] are the
+            n values up to the day i (the last one being the value on the day i)
+
+    Remark:
+        The padding value has to be chosen so that it does not change the result, e.g. 0 for a sum
+        and the first value for a maximum or a minimum.
+    '''
+    # There are no windows if there are no days
+    if len(data) == 0:
+        return np.zeros(data.shape + (n, ))
+    if isinstance(pad, str) and pad == 'first':
+        padding = np.repeat(data[ : 1], n - 1, axis = 0)
+    else:
+        padding = np.full((n - 1, ) + data.shape[1 : ], pad, dtype = float)
+    padded = np.concatenate([padding, data])
+    return np.lib.stride_tricks.sliding_window_view(padded, n, axis = 0)
+
+
+def window_length(m, n, data = None):
+    '''
+    Returns the number of days in the window of every day, which is k on the day k for the first n-1 days and
+    n after that. If `data` is given, the result is reshaped so that it can be broadcast against `data`.
+    '''
+    length = np.minimum(np.arange(1, m + 1), n)
+    if data is not None:
+        length = length.reshape((m, ) + (1, ) * (data.ndim - 1))
+    return length
+
+
+def rolling_count(mask, n):
+    '''
+    Returns the number of True values of `mask` in the window of the last n days up to every day.
+    '''
+    counts = np.cumsum(np.concatenate([np.zeros((1, ) + mask.shape[1 : ], dtype = int), mask]), axis = 0)
+    end = np.arange(1, len(mask) + 1)
+    return counts[end] - counts[end - window_length(len(mask), n)]
+
+
+def rolling_sum(data, n, mask = None):
+    '''
+    Calculates the sum over the window of the last n days up to every day. The sum is NaN if there is
+    a NaN in the window.
+
+    Input:
+        data (ndarray): the values over time, with one row for each day
+        n (int): the length of the window (in days)
+        mask (ndarray, default None): if given, only the values where `mask` is True are added in each
+            window, as `np.sum(window[window_mask])` would do
+
+    Output:
+        total (ndarray): the rolling sum, with the same shape as `data`
+
+    Remark:
+        NumPy adds the values of an array pairwise, so the rounding errors of a sum depend on the length
+        of the array. The values of each window are therefore copied to a contiguous row of their own length
+        and added there, which gives exactly the same results as adding every window separately (and as the
+        loops used before). A cumulative sum over the whole history would be faster, but it would round
+        differently, and the strategies compare the indicators at equal values (e.g. the SMA and the FMA
+        of prices with two decimals are often exactly equal).
+    '''
+    data = np.asarray(data, dtype = float)
+    # There is nothing to add if there are no days or no columns
+    if data.size == 0:
+        return np.zeros(data.shape)
+    m = len(data)
+    # One row for each column, with n-1 values before the first day which are never selected
+    columns = np.concatenate([np.zeros((data[0].size, n - 1)), data.reshape(m, -1).T], axis = 1)
+    if mask is None:
+        selected = np.ones(columns.shape, dtype = bool)
+        selected[ : , : n - 1] = False
+    else:
+        selected = np.concatenate([np.zeros((data[0].size, n - 1), dtype = bool), mask.reshape(m, -1).T], axis = 1)
+    windows = np.lib.stride_tricks.sliding_window_view(columns, n, axis = 1)
+    windows_selected = np.lib.stride_tricks.sliding_window_view(selected, n, axis = 1)
+    total = np.zeros((data[0].size, m))
+    # The windows are copied a block of days at a time, to bound the memory used
+    days = max(1, 2 ** 22 // (data[0].size * n))
+    for begin in range(0, m, days):
+        end = min(begin + days, m)
+        values = np.array(windows[ : , begin : end])
+        chosen = windows_selected[ : , begin : end]
+        if mask is None and begin >= n - 1:
+            # All the windows are full, so each one is already a contiguous row of length n
+            total[ : , begin : end] = np.sum(values, axis = -1)
+            continue
+        total[ : , begin : end] = masked_sum(values, chosen)
+    return total.T.reshape(data.shape)
+
+
+def masked_sum(values, mask):
+    '''
+    Adds the values where `mask` is True along the last axis, rounding in the same way as `np.sum(row[row_mask])`
+    for every row. This is how each window is added in `rolling_sum`.
+    '''
+    # Move the selected values to the start of each row, in the same order,
+    # and add the rows with the same number of selected values together
+    order = np.argsort(mask == False, axis = -1, kind = 'stable')
+    values = np.take_along_axis(values, order, axis = -1)
+    counts = np.sum(mask, axis = -1)
+    total = np.zeros(counts.shape)
+    for count in np.unique(counts):
+        if count > 0:
+            total[counts == count] = np.sum(np.ascontiguousarray(values[counts == count][ : , : count]), axis = -1)
+    return total
+
+
+def rolling_mean(data, n):
+    '''
+    Calculates the mean over the window of the last n days up to every day.
+    The arguments are the same as `rolling_sum`.
+    '''
+    return rolling_sum(data, n) / window_length(len(data), n, data)
+
+
+def rolling_std(data, n):
+    '''
+    Calculates the (population) standard deviation over the window of the last n days up to every day.
+    The arguments are the same as `rolling_sum`.
+    '''
+    # The values are centred on their first value, which does not change the standard deviation
+    # but reduces the rounding errors of the difference between the two means
+    centred = data - np.nan_to_num(data[ : 1])
+    mean = rolling_mean(centred, n)
+    variance = rolling_mean(centred ** 2, n) - mean ** 2
+    return np.sqrt(np.maximum(variance, 0))
+
+
+def rolling_max(data, n):
+    '''
+    Calculates the maximum over the window of the last n days up to every day.
+    '''
+    return np.max(rolling_window(data, n, pad = 'first'), axis = -1)
+
+
+def rolling_min(data, n):
+    '''
+    Calculates the minimum over the window of the last n days up to every day.
+    '''
+    return np.min(rolling_window(data, n, pad = 'first'), axis = -1)
+
+
+def rolling_weighted_mean(data, weights):
+    '''
+    Calculates the weighted mean over the window of the last len(weights) days up to every day.
+    For the first days, the last k weights are used for the k days in the window.
+
+    Remark:
+        The weighted sums of all the windows are calculated by one matrix product, which may round the last
+        digit differently from calculating `np.dot` for each window separately.
+    '''
+    weights = np.array(weights, dtype = float)
+    n = len(weights)
+    total = np.dot(rolling_window(data, n, pad = 0), weights)
+    # The sum of the weights which are actually used on each day
+    weight_sum = np.cumsum(weights[ : : -1])[window_length(len(data), n) - 1]
+    return total / weight_sum.reshape((len(data), ) + (1, ) * (data.ndim - 1))
+
+
 def moving_average(stock_price, n = 7, weights = []):
     '''
     Calculates the n-day (possibly weighted) moving average for a given stock over time.
 
     Input:
         stock_price (ndarray): single column with the share prices over time for one stock,
-            up to the current day.
+            up to the current day, or several columns (one for each stock).
         n (int, default 7): period of the moving average (in days).
         weights (list, default []): must be of length n if specified. Indicates the weights
             to use for the weighted average. If empty, return a non-weighted average.
@@ -20,63 +194,23 @@ def moving_average(stock_price, n = 7, weights = []):
         That is, in terms of the day k in the first n-1 days, the period `n` is automatically adjusted
         to k. I think this approach is sensible, because it does not reduce the amount of the data
         finally returned and it keeps the method of calculation as continuous as possible.
-        2. The variable `stock_price` here is treated as a one-dimensional numpy array.
+        2. The variable `stock_price` here is treated as a one-dimensional numpy array, or as a
+        two-dimensional numpy array with one column for each stock.
         3. When the number of stock prices data `m` is less than `n`, the length of the period `n` is
         automatically adjusted to `m` day(s) to adapt to the situations that there are very few data
         available or the length of the period `n` is very large.
         4. The sum of the components in the list `weights` need not equal to 1. The proportion of each
         component in this list will be calculated later.
     '''
-    # Initialize some parameters or variables
-    m = len(stock_price)
+    stock_price = np.asarray(stock_price, dtype = float)
     p = len(weights)
-    ma = np.array([])
     # The situation of calculating the moving average that is not weighted
     if p == 0:
-        # The situation that the number of stock prices data `m` is larger than or equal to n
-        if m >= n:
-            # For the first n-1 days in the data, the value of the moving average of the day k
-            # (1 <= k <= n-1) is set to be the average of the stock prices of the first k days.
-            for i in range(n - 1):
-                ma_term_i = np.mean(stock_price[ : i + 1])
-                ma = np.append(ma, ma_term_i)
-            # From the day n later, the value of the moving average is calculated normally, which
-            # is the average of the stock prices of the previous n days up to the current day.
-            for i in range(n - 1, m):
-                ma_term_i = np.mean(stock_price[i - n + 1 : i + 1])
-                ma = np.append(ma, ma_term_i)
-            return ma
-        else:
-            # When the number of stock prices data `m` is less than n, the length of the period `n`
-            # is automatically adjusted to `m` day(s).
-            for i in range(m):
-                ma_term_i = np.mean(stock_price[ : i + 1])
-                ma = np.append(ma, ma_term_i)
-            return ma
-    # The situation of calculating the weighted moving average
+        return rolling_mean(stock_price, n)
+    # The situation of calculating the weighted moving average. For the first n-1 days, the weighted average
+    # of the day k (1 <= k <= n-1) is calculated with the last k components of the list `weights`.
     elif p == n:
-        # The situation that the number of stock prices data `m` is larger than or equal to `n`
-        if m >= n:
-            # The idea here is similar. For the first n-1 days in the data, the value of the weighted moving average
-            # of the day k (1 <= k <= n-1) is calculated as the weighted average of the stock prices of the first k
-            # days and the last k components of the list `weights` are used.
-            for i in range(n - 1):
-                ma_term_i = np.dot(stock_price[ : i + 1], weights[n - i - 1 : ]) / np.sum(weights[n - i - 1 : ])
-                ma = np.append(ma, ma_term_i)
-            # From the day n later, the value of the weighted moving average is calculated normally, which
-            # is the weighted average of the stock prices of the previous n days up to the current day.
-            for i in range(n - 1, m):
-                # The `np.dot()` and `np.sum()` functions are used here and the weighted average is calculated.
-                ma_term_i = np.dot(stock_price[i - n + 1 : i + 1], weights) / np.sum(weights)
-                ma = np.append(ma, ma_term_i)
-            return ma
-        else:
-            # When the number of stock prices data `m` is less than `n`, the length of the period `n` is
-            # automatically adjusted to `m` day(s).
-            for i in range(m):
-                ma_term_i = np.dot(stock_price[ : i + 1], weights[m - i - 1 : ]) / np.sum(weights[m - i - 1 : ])
-                ma = np.append(ma, ma_term_i)
-            return ma
+        return rolling_weighted_mean(stock_price, weights)
     # If the length of the list `weights` is not equal to the length of the period `n`, stop the function and throw
     # an appropriate error message.
     else:
@@ -89,7 +223,7 @@ def oscillator(stock_price, n = 7, osc_type = 'stochastic'):
 
     Input:
         stock_price (ndarray): single column with the share prices over time for one stock,
-            up to the current day.
+            up to the current day, or several columns (one for each stock).
         n (int, default 7): period of the moving average (in days).
         osc_type (str, default 'stochastic'): either 'stochastic' or 'RSI' to choose an oscillator.
 
@@ -102,119 +236,183 @@ def oscillator(stock_price, n = 7, osc_type = 'stochastic'):
         the period variable `n` is automatically adjusted to k. I think this approach is sensible, because
         it does not reduce the amount of the data finally returned and it keeps the method of calculation
         as continuous as possible.
-        2. The variable `stock_price` here is treated as a one-dimensional numpy array.
+        2. The variable `stock_price` here is treated as a one-dimensional numpy array, or as a
+        two-dimensional numpy array with one column for each stock.
         3. When the number of stock prices data `m` is less than `n`, the length of the period `n` is
         automatically adjusted to `m` day(s) to adapt to the situations that there are very few data
         available or the length of the period `n` is very large.
     '''
-    # Initialize some parameters or variables
-    m = len(stock_price)
-    osc = np.array([])
+    stock_price = np.asarray(stock_price, dtype = float)
     # The situation of the stochastic oscillator
     if osc_type == 'stochastic':
-        # The situation that the number of stock prices data `m` is larger than or equal to `n`
-        if m >= n:
-            # For the first n-1 days in the data, the value of the stochastic oscillator on the
-            # day k (1 <= k <= n-1) is calculated using the stock prices of the first k days.
-            for i in range(n - 1):
-                highest_price = np.max(stock_price[ : i + 1])
-                lowest_price = np.min(stock_price[ : i + 1])
-                delta = stock_price[i] - lowest_price
-                delta_max = highest_price - lowest_price
-                if delta_max == 0:
-                    osc = np.append(osc, np.nan)
-                else:
-                    osc = np.append(osc, delta / delta_max)
-            # From the day n later, the value of the stochastic oscillator is calculated normally.
-            for i in range(n - 1, m):
-                # The highest and lowest prices and the variables `delta` and `delta_max`
-                # are calculated as required.
-                highest_price = np.max(stock_price[i - n + 1 : i + 1])
-                lowest_price = np.min(stock_price[i - n + 1 : i + 1])
-                delta = stock_price[i] - lowest_price
-                delta_max = highest_price - lowest_price
-                # If delta_max equals zero, which means the stock price in this period remains
-                # constant, the stochastic oscillator does not exist, and so I set it be NaN.
-                # In other cases, it will be the usual value `delta / delta_max`.
-                if delta_max == 0:
-                    osc = np.append(osc, np.nan)
-                else:
-                    osc = np.append(osc, delta / delta_max)
-            return osc
-        else:
-            # When the number of stock prices data `m` is less than `n`, the length of the period `n` is
-            # automatically adjusted to `m` day(s). The calculation process in this case is similar.
-            for i in range(m):
-                highest_price = np.max(stock_price[ : i + 1])
-                lowest_price = np.min(stock_price[ : i + 1])
-                delta = stock_price[i] - lowest_price
-                delta_max = highest_price - lowest_price
-                if delta_max == 0:
-                    osc = np.append(osc, np.nan)
-                else:
-                    osc = np.append(osc, delta / delta_max)
-            return osc
+        # The highest and lowest prices over the period and the variables `delta` and `delta_max`
+        # are calculated as required.
+        highest_price = rolling_max(stock_price, n)
+        lowest_price = rolling_min(stock_price, n)
+        delta = stock_price - lowest_price
+        delta_max = highest_price - lowest_price
+        # If delta_max equals zero, which means the stock price in this period remains
+        # constant, the stochastic oscillator does not exist, and so I set it be NaN.
+        # In other cases, it will be the usual value `delta / delta_max`.
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return np.where(delta_max == 0, np.nan, delta / delta_max)
     # The situation of the relative strength index (RSI) oscillator
     if osc_type == 'RSI':
         # Firstly, calculate all the price differences on consecutive days over all the days.
-        stock_price_diff = stock_price[1 : ] - stock_price[ : -1]
         # The price difference on the initial day (day 0) is regarded as the stock price itself on that day.
-        stock_price_diff = np.concatenate([[stock_price[0]], stock_price_diff])
-        # The situation that the number of stock prices data `m` is larger than or equal to `n`
-        if m >= n:
-            # For the first n-1 days in the data, the value of the RSI oscillator on the day k (1 <= k <= n-1)
-            # is calculated using the stock price differences on consecutive days over the first k days.
-            for i in range(n - 1):
-                stock_price_diff_period = stock_price_diff[ : i + 1]
-                sto_price_diff_peri_posi = stock_price_diff_period[stock_price_diff_period > 0]
-                sto_price_diff_peri_nega = stock_price_diff_period[stock_price_diff_period < 0]
-                if len(sto_price_diff_peri_posi) > 0 and len(sto_price_diff_peri_nega) > 0:
-                    RS = np.mean(sto_price_diff_peri_posi) / np.mean(abs(sto_price_diff_peri_nega))
-                    RSI = RS / (1 + RS)
-                elif len(sto_price_diff_peri_posi) > 0 and len(sto_price_diff_peri_nega) == 0:
-                    RSI = 1
-                elif len(sto_price_diff_peri_posi) == 0 and len(sto_price_diff_peri_nega) > 0:
-                    RSI = 0
-                else:
-                    RSI = np.nan
-                osc = np.append(osc, RSI)
-            # From the day n later, the value of the RSI oscillator is calculated normally.
-            for i in range(n - 1, m):
-                # Take the price differences on consecutive days over the past `n` days
-                stock_price_diff_period = stock_price_diff[i - n + 1 : i + 1]
-                # Separate the positive differences and the negative differences
-                sto_price_diff_peri_posi = stock_price_diff_period[stock_price_diff_period > 0]
-                sto_price_diff_peri_nega = stock_price_diff_period[stock_price_diff_period < 0]
-                # Calculate the relative strength (RS) and the RSI
-                if len(sto_price_diff_peri_posi) > 0 and len(sto_price_diff_peri_nega) > 0:
-                    RS = np.mean(sto_price_diff_peri_posi) / np.mean(abs(sto_price_diff_peri_nega))
-                    RSI = RS / (1 + RS)
-                # RSI should equal to 1 if the stock price is constantly increasing.
-                elif len(sto_price_diff_peri_posi) > 0 and len(sto_price_diff_peri_nega) == 0:
-                    RSI = 1
-                # RSI should equal to 0 if the stock price is constantly decreasing.
-                elif len(sto_price_diff_peri_posi) == 0 and len(sto_price_diff_peri_nega) > 0:
-                    RSI = 0
-                # If the stock price keeps constant over the period, RSI should be NaN.
-                else:
-                    RSI = np.nan
-                osc = np.append(osc, RSI)
-            return osc
-        else:
-            # When the number of stock prices data `m` is less than `n`, the length of the period `n` is
-            # automatically adjusted to `m` day(s). The calculation process in this case is similar.
-            for i in range(m):
-                stock_price_diff_period = stock_price_diff[ : i + 1]
-                sto_price_diff_peri_posi = stock_price_diff_period[stock_price_diff_period > 0]
-                sto_price_diff_peri_nega = stock_price_diff_period[stock_price_diff_period < 0]
-                if len(sto_price_diff_peri_posi) > 0 and len(sto_price_diff_peri_nega) > 0:
-                    RS = np.mean(sto_price_diff_peri_posi) / np.mean(abs(sto_price_diff_peri_nega))
-                    RSI = RS / (1 + RS)
-                elif len(sto_price_diff_peri_posi) > 0 and len(sto_price_diff_peri_nega) == 0:
-                    RSI = 1
-                elif len(sto_price_diff_peri_posi) == 0 and len(sto_price_diff_peri_nega) > 0:
-                    RSI = 0
-                else:
-                    RSI = np.nan
-                osc = np.append(osc, RSI)
-            return osc
+        stock_price_diff = np.concatenate([stock_price[ : 1], stock_price[1 : ] - stock_price[ : -1]])
+        # Separate the positive differences and the negative differences (the NaN differences are neither)
+        positive = stock_price_diff > 0
+        negative = stock_price_diff < 0
+        # The sums and the numbers of the positive and negative differences over the period
+        positive_sum = rolling_sum(stock_price_diff, n, mask = positive)
+        negative_sum = rolling_sum(-stock_price_diff, n, mask = negative)
+        positive_number = rolling_count(positive, n)
+        negative_number = rolling_count(negative, n)
+        # Calculate the relative strength (RS) and the RSI
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            RS = (positive_sum / positive_number) / (negative_sum / negative_number)
+            RSI = RS / (1 + RS)
+        # RSI should equal to 1 if the stock price is constantly increasing, and 0 if the stock price is constantly
+        # decreasing. If the stock price keeps constant over the period, RSI should be NaN.
+        RSI = np.where((positive_number > 0) & (negative_number == 0), 1, RSI)
+        RSI = np.where((positive_number == 0) & (negative_number > 0), 0, RSI)
+        RSI = np.where((positive_number == 0) & (negative_number == 0), np.nan, RSI)
+        return RSI
+
+
+def ema(stock_price, n = 12):
+    '''
+    Calculates the n-day exponential moving average (EMA) for one or several stocks over time.
+
+    Input:
+        stock_price (ndarray): the share prices over time, one column for each stock
+        n (int, default 12): period of the EMA (in days), the smoothing factor being 2 / (n + 1)
+
+    Output:
+        ma (ndarray): the EMA of the share prices over time, with the same shape as `stock_price`
+
+    Remark:
+        On each day, the EMA is the weighted average of all the prices up to that day, with weights
+        decreasing by a factor 1 - 2 / (n + 1) per day into the past. So for the first days, it is the
+        weighted average of the prices available, in the same way as `moving_average`. Only the days are
+        looped over, all the stocks being calculated at the same time.
+    '''
+    stock_price = np.asarray(stock_price, dtype = float)
+    decay = 1 - 2 / (n + 1)
+    ma = np.zeros(stock_price.shape)
+    # The weighted sum of the prices and the sum of the weights up to the current day
+    numerator = np.zeros(stock_price.shape[1 : ])
+    denominator = 0
+    for i in range(len(stock_price)):
+        numerator = stock_price[i] + decay * numerator
+        denominator = 1 + decay * denominator
+        ma[i] = numerator / denominator
+    return ma
+
+
+def bollinger(stock_price, n = 20, k = 2):
+    '''
+    Calculates the Bollinger bands with a period of n days for one or several stocks over time.
+
+    Input:
+        stock_price (ndarray): the share prices over time, one column for each stock
+        n (int, default 20): period of the moving average (in days)
+        k (float, default 2): the number of standard deviations between the moving average and each band
+
+    Output:
+        (lower, middle, upper) (tuple): the lower band, the n-day moving average and the upper band,
+            each with the same shape as `stock_price`
+    '''
+    stock_price = np.asarray(stock_price, dtype = float)
+    middle = rolling_mean(stock_price, n)
+    std = rolling_std(stock_price, n)
+    return (middle - k * std, middle, middle + k * std)
+
+
+def macd(stock_price, fast = 12, slow = 26, signal = 9):
+    '''
+    Calculates the moving average convergence divergence (MACD) for one or several stocks over time.
+
+    Input:
+        stock_price (ndarray): the share prices over time, one column for each stock
+        fast (int, default 12): period of the fast EMA (in days)
+        slow (int, default 26): period of the slow EMA (in days)
+        signal (int, default 9): period of the EMA of the MACD line (in days)
+
+    Output:
+        (macd_line, signal_line, histogram) (tuple): the difference between the fast and the slow EMA,
+            its EMA, and the difference between them, each with the same shape as `stock_price`
+    '''
+    macd_line = ema(stock_price, fast) - ema(stock_price, slow)
+    signal_line = ema(macd_line, signal)
+    return (macd_line, signal_line, macd_line - signal_line)
+
+
+def volatility(stock_price, n = 20):
+    '''
+    Calculates the rolling volatility with a period of n days for one or several stocks over time,
+    which is the standard deviation of the daily price changes over the last n days.
+
+    Input:
+        stock_price (ndarray): the share prices over time, one column for each stock
+        n (int, default 20): period of the volatility (in days)
+
+    Output:
+        vol (ndarray): the rolling volatility, with the same shape as `stock_price`. It is NaN on
+            the day 0, since there is no price change on that day.
+    '''
+    stock_price = np.asarray(stock_price, dtype = float)
+    vol = np.full(stock_price.shape, np.nan)
+    vol[1 : ] = rolling_std(stock_price[1 : ] - stock_price[ : -1], n)
+    return vol
+
+
+def evaluate(stock_prices_data, requests):
+    '''
+    Calculates the indicators requested by a strategy for all the stocks at once. The strategy only declares
+    which indicators it needs, and they are all calculated together here, only on the days when the stocks
+    are not bankrupt.
+
+    Input:
+        stock_prices_data (ndarray): the stock price data, with one column for each stock
+        requests (dict): the indicators to calculate. Each key is the name given to an indicator, and each
+            value is a tuple (indicator, params), where indicator is either 'moving_average' or 'oscillator'
+            and params is a dictionary of the arguments of the function with the same name.
+
+    Output:
+        results (dict): the indicators with the same keys as `requests`, each one is an ndarray with
+            the same shape as `stock_prices_data`
+
+    Example:
+        The SMA and FMA used by the strategy of crossing averages:
+            >>> evaluate(sim_data, {'SMA': ('moving_average', {'n': 200}), 'FMA': ('moving_average', {'n': 50})})
+
+    Remark:
+        1. Once the price of a stock is NaN (the company is bankrupt), it remains NaN, so the indicators are
+        only calculated up to the last day when the price is not NaN, and they are NaN after that day. The stocks
+        are grouped by their last day, and each group is calculated up to its own last day only. The stocks whose
+        prices are NaN from the first day are not calculated at all.
+        2. The same indicator requested under several names is only calculated once.
+    '''
+    (total_period, stock) = stock_prices_data.shape
+    # Find the last day when each stock is not bankrupt, which is -1 if the stock is bankrupt from the first day
+    not_nan = np.isnan(stock_prices_data) == False
+    last_day = np.where(not_nan.any(axis = 0), total_period - 1 - np.argmax(not_nan[ : : -1], axis = 0), -1)
+    # The groups of stocks with the same last day
+    groups = [(day, np.where(last_day == day)[0]) for day in np.unique(last_day) if day >= 0]
+    results = {}
+    calculated = {}
+    for (name, (indicator, params)) in requests.items():
+        # The same indicator with the same arguments is only calculated once
+        key = (indicator, repr(sorted(params.items())))
+        if key in calculated:
+            results[name] = calculated[key]
+            continue
+        function = {'moving_average': moving_average, 'oscillator': oscillator}[indicator]
+        result = np.full(stock_prices_data.shape, np.nan)
+        for (day, columns) in groups:
+            result[ : day + 1, columns] = function(stock_prices_data[ : day + 1, columns], **params)
+        calculated[key] = result
+        results[name] = result
+    return results
@@ -9,7 +9,7 @@ def read_ledger(ledger_file, days = 1825, show = 'report'):
     Input:
         ledger_file (str): path to the ledger file
         days (int, default 1825 (5 years)): the total period of the transaction history
-        show (str, default 'report'): either 'report' or 'return' to choose a way to
+        show (str, default 'report'): either 'report', 'return' or 'history' to choose a way to
             display the result
 
     Output:
@@ -24,7 +24,8 @@ def read_ledger(ledger_file, days = 1825, show = 'report'):
         controls the way to display the information of the simulation. If `show` equals to 'report', the
         overall information of the simulation will be displayed on the screen and the plot of the amount of
         money that we had over time will be produced. On the other hand, If `show` equals to 'return', the
-        tuple `result` is returned in the end which carries the overall information of the ledger file.
+        tuple `result` is returned in the end which carries the overall information of the ledger file. If `show`
+        equals to 'history', the tuple `result` and the list of the amount of money that we had on each day are returned.
     '''
     # Extract all the information from `ledger_file`
     ledger_content = []
@@ -87,3 +88,6 @@ def read_ledger(ledger_file, days = 1825, show = 'report'):
     if show == 'return':
         result = (amount_spent, amount_earned, difference)
         return result
+    if show == 'history':
+        result = (amount_spent, amount_earned, difference)
+        return (result, amount_transaction)
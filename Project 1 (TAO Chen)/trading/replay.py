@@ -0,0 +1,222 @@
+# Replay the stock price data as a stream of ticks, to test the strategies in live conditions.
+import time
+import asyncio
+import numpy as np
+import trading.process as process
+import trading.indicators as indicators
+
+async def publish(stock_prices_data, queues, speed = None):
+    '''
+    Replays the stock price data day by day, and sends every day (a tick) to all the subscribers.
+
+    Input:
+        stock_prices_data (ndarray): the stock price data
+        queues (list): the queues of the subscribers (asyncio.Queue)
+        speed (float, default None): the number of days replayed per second. If None, the days are
+            replayed as fast as the subscribers can process them.
+
+    Output: None
+
+    Remark:
+        Each tick is a tuple (day, stock_price_today, last, sent), where `last` tells whether it is the last
+        day and `sent` is the time when it was sent (from time.perf_counter()). The queues have a maximum size,
+        so the replay waits when a subscriber is too slow (backpressure). A final None is sent to every
+        subscriber to tell that the replay is finished.
+    '''
+    total_period = len(stock_prices_data)
+    for day in range(total_period):
+        tick = (day, stock_prices_data[day], day == total_period - 1, time.perf_counter())
+        # Wait until every subscriber has room for the tick in its queue
+        for queue in queues:
+            await queue.put(tick)
+        if speed is not None:
+            await asyncio.sleep(1 / speed)
+        else:
+            # Let the subscribers run before sending the next tick
+            await asyncio.sleep(0)
+    for queue in queues:
+        await queue.put(None)
+
+
+def last_days(window, day, k):
+    '''
+    Returns the values of the last k days up to `day` from a ring buffer `window` (one row for each stock, the
+    value of the day d being in the column d % size), in the order of the days and as a contiguous array.
+    '''
+    return window[ : , np.arange(day - k + 1, day + 1) % window.shape[1]]
+
+
+async def subscribe(queue, strategy = 'crossing_averages', n = None, m = 50, osc_type = 'stochastic', threshold = [0.25, 0.75], cool_down = 7, amount = 5000, fees = 20, ledger = 'ledger_live.txt'):
+    '''
+    Receives the ticks one by one and trades with the strategy of crossing averages or momentum. The indicators
+    are updated from each new price, only with the last n days kept in memory.
+
+    Input:
+        queue (asyncio.Queue): the queue where the ticks are received
+        strategy (str, default 'crossing_averages'): either 'crossing_averages' or 'momentum'
+        n (int, default None): the period of the SMA (default 200) or of the oscillator (default 7)
+        m (int, default 50): the period of the FMA
+        osc_type, threshold, cool_down, amount, fees: the same as in `strategy.momentum`
+        ledger (str, default 'ledger_live.txt'): path to the ledger file
+
+    Output:
+        stats (dict): 'ticks' (the number of ticks processed), 'orders' (the number of transactions written
+            in the ledger) and 'latency' (an ndarray with the time between sending each tick and having made
+            all the decisions on that day, in seconds)
+
+    Remark:
+        The decisions are the same as those of `strategy.crossing_averages` and `strategy.momentum`, so the
+        ledger is the same as the one written by running these functions on the whole data. The sums over the
+        window are calculated again on each day, in the order of the days as in `indicators.rolling_sum`, since
+        the SMA and the FMA are often exactly equal and updating the sums would change the rounding.
+    '''
+    if strategy not in ['crossing_averages', 'momentum']:
+        raise ValueError('The strategy must be either \'crossing_averages\' or \'momentum\', not {!r}.'.format(strategy))
+    if strategy == 'momentum' and osc_type not in ['stochastic', 'RSI']:
+        raise ValueError('The oscillator must be either \'stochastic\' or \'RSI\', not {!r}.'.format(osc_type))
+    if n is None:
+        n = 200 if strategy == 'crossing_averages' else 7
+    latency = []
+    orders = 0
+    day_count = 0
+    # The portfolio and the last days of prices (or of price differences), created on the first day
+    # when the number of stocks is known
+    portfolio = None
+    record = None
+    window = None
+    previous_price = None
+    previous_difference = None
+    while True:
+        tick = await queue.get()
+        if tick is None:
+            break
+        (day, stock_price_today, last, sent) = tick
+        bankrupt = np.isnan(stock_price_today)
+        if day == 0:
+            stock = len(stock_price_today)
+            portfolio = process.create_portfolio([amount] * stock, stock_price_today, fees, ledger)
+            record = [0] * stock
+            if strategy == 'crossing_averages':
+                # The last max(n, m) prices of each stock, for the SMA and the FMA
+                window = np.zeros((stock, max(n, m)))
+            elif osc_type == 'stochastic':
+                # The last n prices, filled with the first price so that the first days only use the prices available
+                window = np.repeat(stock_price_today[ : , np.newaxis], n, axis = 1)
+            else:
+                # The last n price differences, the difference on the first day being the price itself
+                window = np.zeros((stock, n))
+                previous_price = np.zeros(stock)
+        # Update the indicators with today's prices
+        if strategy == 'crossing_averages':
+            window[ : , day % window.shape[1]] = stock_price_today
+            (slow, fast) = (min(day + 1, n), min(day + 1, m))
+            difference = np.sum(last_days(window, day, fast), axis = -1) / fast - \
+            np.sum(last_days(window, day, slow), axis = -1) / slow
+        elif osc_type == 'stochastic':
+            window[ : , day % n] = stock_price_today
+            lowest_price = np.min(window, axis = 1)
+            delta_max = np.max(window, axis = 1) - lowest_price
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                osc = np.where(delta_max == 0, np.nan, (stock_price_today - lowest_price) / delta_max)
+        else:
+            window[ : , day % n] = stock_price_today - previous_price
+            previous_price = stock_price_today
+            differences = last_days(window, day, min(day + 1, n))
+            positive = differences > 0
+            negative = differences < 0
+            positive_number = np.sum(positive, axis = 1)
+            negative_number = np.sum(negative, axis = 1)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                RS = (indicators.masked_sum(differences, positive) / positive_number) / \
+                (indicators.masked_sum(-differences, negative) / negative_number)
+                osc = RS / (1 + RS)
+            osc = np.where((positive_number > 0) & (negative_number == 0), 1, osc)
+            osc = np.where((positive_number == 0) & (negative_number > 0), 0, osc)
+            osc = np.where((positive_number == 0) & (negative_number == 0), np.nan, osc)
+        if day > 0:
+            # Clear the stock whose price is NaN in the portfolio
+            for i in np.where(bankrupt)[0]:
+                portfolio[i] = 0
+            alive = np.where(bankrupt == False)[0]
+            # In the last day, sell all remaining stocks
+            if last:
+                for i in alive:
+                    orders += portfolio[i] != 0
+                    process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+            elif strategy == 'crossing_averages':
+                for i in alive:
+                    if previous_difference[i] < 0 and difference[i] > 0:
+                        process.buy(day, i, amount, stock_price_today, fees, portfolio, ledger)
+                        orders += 1
+                    elif previous_difference[i] > 0 and difference[i] < 0:
+                        orders += portfolio[i] != 0
+                        process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+            else:
+                for i in alive:
+                    if osc[i] < threshold[0] and (record[i] == 0 or day - record[i] > cool_down):
+                        process.buy(day, i, amount, stock_price_today, fees, portfolio, ledger)
+                        record[i] = day
+                        orders += 1
+                    elif osc[i] > threshold[1]:
+                        orders += portfolio[i] != 0
+                        process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+                        record[i] = day
+        if strategy == 'crossing_averages':
+            previous_difference = difference
+        latency.append(time.perf_counter() - sent)
+        day_count += 1
+    return {'ticks': day_count, 'orders': orders, 'latency': np.array(latency)}
+
+
+async def replay_async(stock_prices_data, strategies, speed = None, maxsize = 10):
+    '''
+    The coroutine run by `replay`, with the same arguments. The replay and the subscribers run as tasks, and if
+    one of them fails, the others are cancelled and the error is raised, instead of waiting for a full queue.
+    '''
+    queues = [asyncio.Queue(maxsize = maxsize) for params in strategies]
+    subscribers = [asyncio.create_task(subscribe(queue, **params)) for (queue, params) in zip(queues, strategies)]
+    publisher = asyncio.create_task(publish(stock_prices_data, queues, speed))
+    (done, pending) = await asyncio.wait(subscribers + [publisher], return_when = asyncio.FIRST_EXCEPTION)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions = True)
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in subscribers]
+
+
+def replay(stock_prices_data, strategies, speed = None, maxsize = 10, show = 'report'):
+    '''
+    Replays the stock price data as a stream of ticks to several strategies running at the same time,
+    and measures the time between each tick and the orders made by the strategies.
+
+    Input:
+        stock_prices_data (ndarray): the stock price data, e.g. from `get_data()`
+        strategies (list): list of dictionaries, the arguments of `subscribe` for each strategy
+        speed (float, default None): the number of days replayed per second (as fast as possible if None)
+        maxsize (int, default 10): the maximum number of ticks waiting in the queue of each strategy
+        show (str, default 'report'): either 'report' or 'return' to choose a way to display the result
+
+    Output:
+        stats (list): the dictionary returned by `subscribe` for each strategy, with the extra key
+            'throughput' (the number of ticks processed per second)
+
+    Example:
+        Replay the data to the strategies of crossing averages and momentum at the same time:
+            >>> replay(sim_data, [{'strategy': 'crossing_averages', 'ledger': 'ledger_live_cro.txt'},
+            ...                   {'strategy': 'momentum', 'osc_type': 'RSI', 'n': 14, 'ledger': 'ledger_live_mom.txt'}])
+    '''
+    start = time.perf_counter()
+    stats = asyncio.run(replay_async(stock_prices_data, strategies, speed, maxsize))
+    elapsed = time.perf_counter() - start
+    for result in stats:
+        result['throughput'] = result['ticks'] / elapsed
+    # If the way of showing the result is 'report', the latency and the throughput are displayed on the screen
+    if show == 'report':
+        for (params, result) in zip(strategies, stats):
+            print('{}: {} ticks and {} orders, {:.1f} ticks per second, latency {:.3f} ms on average and {:.3f} ms at most.'\
+            .format(params.get('ledger', 'ledger_live.txt'), result['ticks'], result['orders'], result['throughput'], \
+            1000 * np.mean(result['latency']), 1000 * np.max(result['latency'])))
+    if show == 'return':
+        return stats
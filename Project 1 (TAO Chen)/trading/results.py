@@ -0,0 +1,174 @@
+# Store the results of the strategies, to compare them without running them again.
+import os
+import json
+import sqlite3
+import hashlib
+import inspect
+import tempfile
+import numpy as np
+import trading.strategy as strategy
+import trading.performance as performance
+
+def open_store(path = 'results.db'):
+    '''
+    Opens the results store in the SQLite database `path`. If the file doesn't exist, create it.
+
+    Input:
+        path (str, default 'results.db'): path to the database file
+
+    Output:
+        store (sqlite3.Connection): the connection to the database, to pass to the other functions
+
+    Remark:
+        The table `runs` has one row for each run, with the name of the strategy, its parameters (as JSON),
+        the fingerprint of the data, the seed and the tuple (spent, earned, profit) returned by `read_ledger`.
+        The table `equity` has the amount of money that we had on each day of each run. The runs are indexed
+        by their configuration (to find a cached run) and by (strategy, fingerprint, profit) (to find the best
+        parameters), so these queries do not scan the whole table.
+    '''
+    store = sqlite3.connect(path)
+    store.executescript(\
+    '''
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        strategy TEXT NOT NULL,
+        params TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        seed INTEGER,
+        spent REAL NOT NULL,
+        earned REAL NOT NULL,
+        profit REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS runs_config ON runs (strategy, fingerprint, params, seed);
+    CREATE INDEX IF NOT EXISTS runs_profit ON runs (strategy, fingerprint, profit);
+    CREATE TABLE IF NOT EXISTS equity (
+        run_id INTEGER NOT NULL REFERENCES runs (id),
+        day INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (run_id, day)
+    ) WITHOUT ROWID;
+    ''')
+    return store
+
+
+def fingerprint(stock_prices_data):
+    '''
+    Returns a short string which identifies the stock price data (its shape and all its values),
+    so that the runs on the same data can be found again.
+    '''
+    data = np.ascontiguousarray(stock_prices_data, dtype = float)
+    h = hashlib.sha1(str(data.shape).encode())
+    h.update(data.tobytes())
+    return h.hexdigest()
+
+
+def full_params(strategy_name, params):
+    '''
+    Completes the parameters of a strategy with the default values of the arguments which are not given,
+    so that the same configuration is always recorded in the same way.
+    '''
+    function = {'random': strategy.random, 'crossing_averages': strategy.crossing_averages,
+                'momentum': strategy.momentum}[strategy_name]
+    full = {}
+    for (name, argument) in inspect.signature(function).parameters.items():
+        if name not in ['stock_prices_data', 'ledger', 'seed', 'averages', 'osc']:
+            full[name] = argument.default
+    full.update(params)
+    def python_value(value):
+        '''
+        Converts the values from NumPy (e.g. from `np.arange`) to the usual Python numbers and lists.
+        '''
+        if isinstance(value, (np.generic, np.ndarray)):
+            return value.tolist()
+        raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+    return json.dumps(full, sort_keys = True, default = python_value)
+
+
+def run(store, strategy_name, stock_prices_data, params = {}, seed = None):
+    '''
+    Runs a strategy and records its result in the store. If the same strategy has already been run with
+    the same parameters, the same seed and the same data, the recorded result is returned instead.
+
+    Input:
+        store (sqlite3.Connection): the store returned by `open_store`
+        strategy_name (str): either 'random', 'crossing_averages' or 'momentum'
+        stock_prices_data (ndarray): the stock price data
+        params (dict, default {}): the arguments of the strategy (e.g. {'n': 200, 'm': 50})
+        seed (int, default None): the seed of the strategy 'random' (ignored for the other strategies)
+
+    Output:
+        result (tuple): the total expenditure, the total income and the final net profit
+
+    Example:
+        >>> store = open_store()
+        >>> run(store, 'crossing_averages', sim_data, {'n': 200, 'm': 50})
+
+    Remark:
+        The strategy 'random' is run again every time if `seed` is None, since its result cannot be repeated.
+    '''
+    if strategy_name != 'random':
+        seed = None
+    key = full_params(strategy_name, params)
+    data_fingerprint = fingerprint(stock_prices_data)
+    # Look for the same configuration in the store
+    if strategy_name != 'random' or seed is not None:
+        row = store.execute('SELECT spent, earned, profit FROM runs WHERE strategy = ? AND fingerprint = ? '
+                            'AND params = ? AND seed IS ?', (strategy_name, data_fingerprint, key, seed)).fetchone()
+        if row is not None:
+            return tuple(row)
+    # Run the strategy with a temporary ledger, and read its result
+    function = {'random': strategy.random, 'crossing_averages': strategy.crossing_averages,
+                'momentum': strategy.momentum}[strategy_name]
+    extra = {'seed': seed} if strategy_name == 'random' else {}
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = os.path.join(directory, 'ledger.txt')
+        function(stock_prices_data, ledger = ledger, **params, **extra)
+        (result, amount) = performance.read_ledger(ledger, days = len(stock_prices_data), show = 'history')
+    # Record the result and the amount of money on each day
+    with store:
+        run_id = store.execute('INSERT INTO runs (strategy, params, fingerprint, seed, spent, earned, profit) '
+                               'VALUES (?, ?, ?, ?, ?, ?, ?)', (strategy_name, key, data_fingerprint, seed) + result).lastrowid
+        store.executemany('INSERT INTO equity (run_id, day, amount) VALUES (?, ?, ?)',
+                          [(run_id, day, float(amount[day])) for day in range(len(amount))])
+    return result
+
+
+def best_params(store, strategy_name, stock_prices_data, number = 1):
+    '''
+    Finds the parameters of a strategy with the largest profits among the runs recorded on the same data.
+
+    Input:
+        store (sqlite3.Connection): the store returned by `open_store`
+        strategy_name (str): either 'random', 'crossing_averages' or 'momentum'
+        stock_prices_data (ndarray or str): the stock price data, or its fingerprint
+        number (int, default 1): the number of runs to return
+
+    Output:
+        best (list): list of tuples (params, seed, result), from the largest profit to the smallest
+    '''
+    if not isinstance(stock_prices_data, str):
+        stock_prices_data = fingerprint(stock_prices_data)
+    rows = store.execute('SELECT params, seed, spent, earned, profit FROM runs WHERE strategy = ? AND fingerprint = ? '
+                         'ORDER BY profit DESC LIMIT ?', (strategy_name, stock_prices_data, number)).fetchall()
+    return [(json.loads(params), seed, (spent, earned, profit)) for (params, seed, spent, earned, profit) in rows]
+
+
+def equity(store, strategy_name, stock_prices_data, params = {}, seed = None):
+    '''
+    Returns the amount of money that we had on each day (as in the plot of `read_ledger`) for a recorded run,
+    or None if this run is not in the store. The arguments are the same as `run`.
+
+    Remark:
+        The runs of the strategy 'random' without a seed cannot be told apart, so None is returned for them.
+    '''
+    if strategy_name != 'random':
+        seed = None
+    elif seed is None:
+        return None
+    rows = store.execute('SELECT equity.amount FROM runs JOIN equity ON equity.run_id = runs.id '
+                         'WHERE runs.strategy = ? AND runs.fingerprint = ? AND runs.params = ? AND runs.seed IS ? '
+                         'ORDER BY equity.day', (strategy_name, fingerprint(stock_prices_data),
+                         full_params(strategy_name, params), seed)).fetchall()
+    if len(rows) == 0:
+        return None
+    return np.array([amount for (amount, ) in rows])
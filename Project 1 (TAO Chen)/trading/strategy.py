@@ -1,9 +1,14 @@
 # Functions to implement our trading strategy.
+import os
+import heapq
+import inspect
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 import trading.process as process
 import trading.indicators as indicators
+import trading.performance as performance
 
-def random(stock_prices_data, period = 7, amount = 5000, fees = 20, ledger = 'ledger_random.txt'):
+def random(stock_prices_data, period = 7, amount = 5000, fees = 20, ledger = 'ledger_random.txt', seed = None):
     '''
     Randomly decide, every period, which stocks to purchase,
     do nothing, or sell (with equal probability).
@@ -15,6 +20,7 @@ def random(stock_prices_data, period = 7, amount = 5000, fees = 20, ledger = 'le
         amount (float, default 5000): how much we spend on each purchase (must cover fees)
         fees (float, default 20): transaction fees
         ledger (str, default 'ledger_random.txt'): path to the ledger file
+        seed (int, default None): the seed of the random number generator, to repeat the same decisions
 
     Output: None
     '''
@@ -23,7 +29,7 @@ def random(stock_prices_data, period = 7, amount = 5000, fees = 20, ledger = 'le
     # Create the portfolio
     portfolio = process.create_portfolio([amount] * stock, stock_prices_data[0], fees, ledger)
     # Set the random number generator
-    rng = np.random.default_rng()
+    rng = np.random.default_rng(seed)
     # The decision is made completely randomly, which means all kinds of decisions have equal chance.
     chance = [1/3, 1/3, 1/3]
     # Loop over a `range(1, total_period)` and the interval is `period`
@@ -53,7 +59,7 @@ def random(stock_prices_data, period = 7, amount = 5000, fees = 20, ledger = 'le
                 process.sell(day, i, stock_price_today, fees, portfolio, ledger)
 
 
-def crossing_averages(stock_prices_data, n = 200, m = 50, amount = 5000, fees = 20, ledger = 'ledger_cro_aver.txt'):
+def crossing_averages(stock_prices_data, n = 200, m = 50, amount = 5000, fees = 20, ledger = 'ledger_cro_aver.txt', averages = None):
     '''
     This function is the implementation of the strategy of crossing averages. It decides which stocks to purchase,
     do nothing or to sell in every period according to the crossing points between the slow moving average (SMA)
@@ -66,6 +72,8 @@ def crossing_averages(stock_prices_data, n = 200, m = 50, amount = 5000, fees =
         amount (float, default 5000): how much we spend on each purchase (must cover fees)
         fees (float, default 20): transaction fees
         ledger (str, default 'ledger_cro_aver.txt'): path to the ledger file
+        averages (tuple, default None): the SMA and FMA of all the stocks, with the same shape as
+            `stock_prices_data`, if they are already calculated. If None, they are calculated here.
 
     Output: None
     '''
@@ -73,13 +81,13 @@ def crossing_averages(stock_prices_data, n = 200, m = 50, amount = 5000, fees =
     (total_period, stock) = stock_prices_data.shape
     # Create the portfolio
     portfolio = process.create_portfolio([amount] * stock, stock_prices_data[0], fees, ledger)
-    # Initialize the variables SMA and FMA
-    SMA = np.zeros(shape = stock_prices_data.shape)
-    FMA = np.zeros(shape = stock_prices_data.shape)
-    # Calculate the SMA and FMA of all types of stocks
-    for i in range(stock):
-        SMA[ : , i] = indicators.moving_average(stock_prices_data[ : , i], n = n)
-        FMA[ : , i] = indicators.moving_average(stock_prices_data[ : , i], n = m)
+    if averages is None:
+        # Calculate the SMA and FMA of all types of stocks, only on the days when they are not bankrupt
+        averages = indicators.evaluate(stock_prices_data, {'SMA': ('moving_average', {'n': n}),
+                                                           'FMA': ('moving_average', {'n': m})})
+        (SMA, FMA) = (averages['SMA'], averages['FMA'])
+    else:
+        (SMA, FMA) = averages
     # The difference between SMA and FMA
     difference = FMA - SMA
     # Loop over a `range(1, total_period)`
@@ -105,7 +113,7 @@ def crossing_averages(stock_prices_data, n = 200, m = 50, amount = 5000, fees =
             for i in np.where(np.isnan(stock_price_today) == False)[0]:
                     process.sell(day, i, stock_price_today, fees, portfolio, ledger)
 
-def momentum(stock_prices_data, osc_type = 'stochastic', n = 7, threshold = [0.25, 0.75], cool_down = 7, amount = 5000, fees = 20, ledger = 'ledger_momentum.txt'):
+def momentum(stock_prices_data, osc_type = 'stochastic', n = 7, threshold = [0.25, 0.75], cool_down = 7, amount = 5000, fees = 20, ledger = 'ledger_momentum.txt', osc = None):
     '''
     This function is the implementation of the strategy of momentum trading using oscillators. It decides
     which stocks to purchase, do nothing or to sell in every period according to the level of a oscillator.
@@ -120,6 +128,8 @@ def momentum(stock_prices_data, osc_type = 'stochastic', n = 7, threshold = [0.2
         amount (float, default 5000): how much we spend on each purchase (must cover fees)
         fees (float, default 20): transaction fees
         ledger (str, default 'ledger_momentum.txt'): path to the ledger file
+        osc (ndarray, default None): the oscillator of all the stocks, with the same shape as
+            `stock_prices_data`, if it is already calculated. If None, it is calculated here.
 
     Output: None
     '''
@@ -129,11 +139,11 @@ def momentum(stock_prices_data, osc_type = 'stochastic', n = 7, threshold = [0.2
     portfolio = process.create_portfolio([amount] * stock, stock_prices_data[0], fees, ledger)
     # The date of the purchase of every stock is recorded by the list `record`
     record = [0] * stock
-    # Initialize the oscillator
-    oscillator = np.zeros(shape = stock_prices_data.shape)
-    # Calculate the oscillator of all types of stocks
-    for i in range(stock):
-        oscillator[ : , i] = indicators.oscillator(stock_prices_data[ : , i], n = n, osc_type = osc_type)
+    if osc is None:
+        # Calculate the oscillator of all types of stocks, only on the days when they are not bankrupt
+        oscillator = indicators.evaluate(stock_prices_data, {'osc': ('oscillator', {'n': n, 'osc_type': osc_type})})['osc']
+    else:
+        oscillator = osc
     # Loop over a `range(1, total_period)`
     for day in range(1, total_period):
         # Get today's stock prices
@@ -159,3 +169,331 @@ def momentum(stock_prices_data, osc_type = 'stochastic', n = 7, threshold = [0.2
         else:
             for i in np.where(np.isnan(stock_price_today) == False)[0]:
                     process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+
+
+def multiple(stock_prices_data, strategies, amount = 5000, fees = 20):
+    '''
+    Runs several strategies at the same time, walking through the days of the stock price data only once.
+    The indicators are calculated once and shared by all the strategies which use them, and every strategy
+    has its own portfolio and its own ledger.
+
+    Input:
+        stock_prices_data (ndarray): the stock price data
+        strategies (list): list of dictionaries, one for each strategy to run. The key 'strategy' is either
+            'random', 'crossing_averages' or 'momentum', the key 'ledger' is the path to the ledger file, and
+            the other keys are the arguments of the corresponding function (e.g. 'period', 'seed', 'n', 'm', 'osc_type',
+            'threshold', 'cool_down', 'amount', 'fees'). The arguments not given take the same default values
+            as in the functions `random`, `crossing_averages` and `momentum`.
+        amount (float, default 5000): how much we spend on each purchase (must cover fees), unless
+            specified for a strategy
+        fees (float, default 20): transaction fees, unless specified for a strategy
+
+    Output: None
+
+    Example:
+        Compare the three strategies on the same data:
+            >>> multiple(sim_data, [{'strategy': 'random', 'ledger': 'ledger_random.txt'},
+            ...                     {'strategy': 'crossing_averages', 'n': 200, 'm': 50, 'ledger': 'ledger_cro_aver.txt'},
+            ...                     {'strategy': 'momentum', 'osc_type': 'RSI', 'ledger': 'ledger_momentum.txt'}])
+
+    Remark:
+        Each ledger contains the same transactions as the ledger written by running the corresponding
+        strategy on its own (for the strategy 'random', only if the same `seed` is given).
+    '''
+    # Record the shape of the stock price data
+    (total_period, stock) = stock_prices_data.shape
+    functions = {'random': random, 'crossing_averages': crossing_averages, 'momentum': momentum}
+    # Prepare the arguments of every strategy, and declare the indicators that they need
+    states = []
+    requests = {}
+    for params in strategies:
+        # The default values are taken from the signature of the function, so that they are always the same
+        parameters = inspect.signature(functions[params['strategy']]).parameters
+        state = {name: argument.default for (name, argument) in parameters.items()
+                 if argument.default is not inspect.Parameter.empty}
+        state.update(amount = amount, fees = fees)
+        state.update(params)
+        if state['strategy'] == 'crossing_averages':
+            requests[('moving_average', state['n'])] = ('moving_average', {'n': state['n']})
+            requests[('moving_average', state['m'])] = ('moving_average', {'n': state['m']})
+        elif state['strategy'] == 'momentum':
+            requests[('oscillator', state['osc_type'], state['n'])] = ('oscillator', {'n': state['n'], 'osc_type': state['osc_type']})
+        states.append(state)
+    # The indicators are calculated all together, and shared by all the strategies which use them
+    shared_indicators = indicators.evaluate(stock_prices_data, requests)
+    # Prepare the indicators and the portfolio of every strategy
+    for state in states:
+        if state['strategy'] == 'random':
+            state['rng'] = np.random.default_rng(state['seed'])
+        elif state['strategy'] == 'crossing_averages':
+            state['difference'] = shared_indicators[('moving_average', state['m'])] - \
+            shared_indicators[('moving_average', state['n'])]
+        elif state['strategy'] == 'momentum':
+            state['oscillator'] = shared_indicators[('oscillator', state['osc_type'], state['n'])]
+            state['record'] = [0] * stock
+        state['portfolio'] = process.create_portfolio([state['amount']] * stock, stock_prices_data[0], \
+        state['fees'], state['ledger'])
+    # Loop over a `range(1, total_period)`, only once for all the strategies
+    for day in range(1, total_period):
+        # Get today's stock prices and the stocks whose prices are not NaN, which are shared by all the strategies
+        stock_price_today = stock_prices_data[day]
+        bankrupt = np.isnan(stock_price_today)
+        alive = np.where(bankrupt == False)[0]
+        for state in states:
+            # The strategy 'random' only makes decisions once every period
+            if state['strategy'] == 'random' and (day - 1) % state['period'] != 0:
+                continue
+            (portfolio, ledger, fees) = (state['portfolio'], state['ledger'], state['fees'])
+            # Clear the stock whose price is NaN in the portfolio
+            for i in np.where(bankrupt)[0]:
+                portfolio[i] = 0
+            # In the last day of making decisions, sell all remaining stocks
+            if (state['strategy'] == 'random' and day + state['period'] >= total_period) or \
+            (state['strategy'] != 'random' and day == total_period - 1):
+                for i in alive:
+                    process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+            # The decisions are made in the same way as in the functions `random`, `crossing_averages` and `momentum`
+            elif state['strategy'] == 'random':
+                for i in alive:
+                    decision = state['rng'].choice([0, 1, 2], p = [1/3, 1/3, 1/3])
+                    if decision == 0:
+                        process.buy(day, i, state['amount'], stock_price_today, fees, portfolio, ledger)
+                    elif decision == 2:
+                        process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+            elif state['strategy'] == 'crossing_averages':
+                difference = state['difference']
+                for i in alive:
+                    if difference[day - 1, i] < 0 and difference[day, i] > 0:
+                        process.buy(day, i, state['amount'], stock_price_today, fees, portfolio, ledger)
+                    elif difference[day - 1, i] > 0 and difference[day, i] < 0:
+                        process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+            elif state['strategy'] == 'momentum':
+                (osc, record, threshold) = (state['oscillator'], state['record'], state['threshold'])
+                for i in alive:
+                    if osc[day, i] < threshold[0] and (record[i] == 0 or day - record[i] > state['cool_down']):
+                        process.buy(day, i, state['amount'], stock_price_today, fees, portfolio, ledger)
+                        record[i] = day
+                    elif osc[day, i] > threshold[1]:
+                        process.sell(day, i, stock_price_today, fees, portfolio, ledger)
+                        record[i] = day
+
+
+def blocks(data_file, strategy = crossing_averages, block_size = 1000, ledger = 'ledger_blocks.txt', fan_in = 64, **kwargs):
+    '''
+    Runs a strategy over a memory-mapped stock price matrix in blocks of columns, so that only one block
+    of the data (and of its indicators) is in memory at any time, and merges the ledgers of all the blocks
+    into a single ledger in the order of the days.
+
+    Input:
+        data_file (str or ndarray): path to a `.npy` file holding the stock price data (saved with
+            `np.save()`), which is opened with `mmap_mode = 'r'`, or an array (e.g. an `np.memmap`)
+        strategy (function, default crossing_averages): the strategy to run on each block, which is
+            one of `random`, `crossing_averages` or `momentum`
+        block_size (int, default 1000): the number of stocks (columns) in each block
+        ledger (str, default 'ledger_blocks.txt'): path to the ledger file
+        fan_in (int, default 64): the maximum number of ledger files merged (and open) at the same time
+        **kwargs: other arguments passed to the strategy (e.g. `n`, `m`, `amount`, `fees`)
+
+    Output: None
+
+    Example:
+        Run the strategy of crossing averages over 500000 stocks, 1000 stocks at a time:
+            >>> np.save('stock_data.npy', sim_data)
+            >>> blocks('stock_data.npy', crossing_averages, block_size = 1000, n = 200, m = 50)
+
+    Remark:
+        1. The stocks are traded independently of each other, so running the strategy on each block gives
+        the same transactions as running it on the whole data. In the ledger of every block, the transactions
+        are recorded day by day and stock by stock, so the merged ledger is ordered in the same way as
+        the ledger written by running the strategy on the whole data.
+        2. The ledger of each block is written to a temporary file next to `ledger`, which is removed
+        after merging, and the stock indices in it are shifted back to the column indices in the whole data.
+        If there are more than `fan_in` blocks, their ledgers are merged in several passes, `fan_in` files
+        at a time, so that the number of open files stays bounded.
+        3. For the strategy `random` with a seed, each block uses the seed [seed, k] (k being the index of
+        the block), so that the blocks make independent decisions which can still be repeated.
+    '''
+    # Open the stock price data as a memory map, so that it is not read into memory at once
+    if isinstance(data_file, str):
+        stock_prices_data = np.load(data_file, mmap_mode = 'r')
+    else:
+        stock_prices_data = data_file
+    stock = stock_prices_data.shape[1]
+    # Run the strategy on each block of columns, and write the transactions in a separate ledger
+    block_ledgers = []
+    seed = kwargs.pop('seed', None)
+    for start in range(0, stock, block_size):
+        block_ledger = '{}.block{}'.format(ledger, start // block_size)
+        # Remove the leftover of a previous run, since the ledger files are written in the form of additional writing
+        if os.path.exists(block_ledger):
+            os.remove(block_ledger)
+        # Only the current block of the data is read from the disk into memory
+        block_data = np.array(stock_prices_data[ : , start : start + block_size], dtype = float)
+        if seed is not None:
+            kwargs['seed'] = [seed, start // block_size]
+        strategy(block_data, ledger = block_ledger, **kwargs)
+        block_ledgers.append((block_ledger, start))
+
+    def read_block(block_ledger, start):
+        '''
+        Reads the transactions of one block line by line, and shifts the stock indices by `start`.
+        '''
+        if not os.path.exists(block_ledger):
+            return
+        with open(block_ledger, 'r') as f:
+            for line in f:
+                record = line.strip('\n').split(',')
+                record[2] = str(int(record[2]) + start)
+                yield (int(record[1]), int(record[2])), ','.join(record) + '\n'
+
+    def merge(sources, destination, mode):
+        '''
+        Merges the ledgers `sources` (a list of (path, start)) into `destination` in the order of the days
+        (and of the stocks in each day), and removes them.
+        '''
+        with open(destination, mode) as f:
+            for key, line in heapq.merge(*[read_block(block_ledger, start) for (block_ledger, start) in sources]):
+                f.write(line)
+        for (block_ledger, start) in sources:
+            if os.path.exists(block_ledger):
+                os.remove(block_ledger)
+
+    # Merge the ledgers `fan_in` at a time until few enough are left, the merged ledgers having the stock
+    # indices of the whole data already
+    level = 0
+    while len(block_ledgers) > fan_in:
+        merged_ledgers = []
+        for k in range(0, len(block_ledgers), fan_in):
+            merged_ledger = '{}.merge{}_{}'.format(ledger, level, k // fan_in)
+            merge(block_ledgers[k : k + fan_in], merged_ledger, 'w')
+            merged_ledgers.append((merged_ledger, 0))
+        block_ledgers = merged_ledgers
+        level += 1
+    merge(block_ledgers, ledger, 'a')
+
+
+def walk_forward_window(strategy, train_data, test_data, train_indicators, test_indicators, params, ledger, **kwargs):
+    '''
+    Runs one window of a walk-forward test: every set of parameters is tried on the training period,
+    and the best one (with the largest profit) is then run on the test period.
+
+    Input:
+        strategy (str): either 'crossing_averages' or 'momentum'
+        train_data (ndarray): the stock price data of the training period
+        test_data (ndarray): the stock price data of the test period
+        train_indicators (list): the indicators of the training period for each set of parameters
+        test_indicators (list): the indicators of the test period for each set of parameters
+        params (list): list of dictionaries, the sets of parameters to try
+        ledger (str): path prefix of the ledger files of this window
+        **kwargs: other arguments passed to the strategy (e.g. `amount`, `fees`)
+
+    Output:
+        (best, result) (tuple): the index of the best set of parameters, and the tuple
+            (spent, earned, profit) returned by `read_ledger` for the test period
+    '''
+    function = {'crossing_averages': crossing_averages, 'momentum': momentum}[strategy]
+    keyword = {'crossing_averages': 'averages', 'momentum': 'osc'}[strategy]
+    # Try every set of parameters on the training period
+    profits = []
+    for k in range(len(params)):
+        # If no stock is alive at the start of the training period, nothing is traded and no ledger is written
+        if train_data.shape[1] == 0:
+            profits.append(0)
+            continue
+        train_ledger = '{}_train_{}.txt'.format(ledger, k)
+        if os.path.exists(train_ledger):
+            os.remove(train_ledger)
+        function(train_data, ledger = train_ledger, **{keyword: train_indicators[k]}, **params[k], **kwargs)
+        profits.append(performance.read_ledger(train_ledger, days = len(train_data), show = 'return')[2])
+        os.remove(train_ledger)
+    # Run the best set of parameters on the test period
+    best = int(np.argmax(profits))
+    if test_data.shape[1] == 0:
+        return (best, (0, 0, 0))
+    test_ledger = '{}_test.txt'.format(ledger)
+    if os.path.exists(test_ledger):
+        os.remove(test_ledger)
+    function(test_data, ledger = test_ledger, **{keyword: test_indicators[best]}, **params[best], **kwargs)
+    result = performance.read_ledger(test_ledger, days = len(test_data), show = 'return')
+    return (best, result)
+
+
+def walk_forward(stock_prices_data, strategy = 'crossing_averages', params = [{}], train = 365, test = 90, step = 30, workers = None, ledger = 'ledger_walk_forward', **kwargs):
+    '''
+    Validates a strategy with walk-forward windows. In each window, the sets of parameters are compared on
+    the training period, and the best one is run on the test period just after it. The windows are moved
+    forward by `step` days each time, and they are run in parallel in several processes.
+
+    Input:
+        stock_prices_data (ndarray): the stock price data
+        strategy (str, default 'crossing_averages'): either 'crossing_averages' or 'momentum'
+        params (list, default [{}]): list of dictionaries, the sets of parameters to compare
+            (e.g. [{'n': 200, 'm': 50}, {'n': 100, 'm': 20}])
+        train (int, default 365): the length of the training period (days)
+        test (int, default 90): the length of the test period (days)
+        step (int, default 30): the number of days between the starts of two consecutive windows
+        workers (int, default None): the number of processes (by default, the number of processors)
+        ledger (str, default 'ledger_walk_forward'): path prefix of the ledger files, the test ledger
+            of the window k is kept in the file '{ledger}_{k}_test.txt'
+        **kwargs: other arguments passed to the strategy (e.g. `amount`, `fees`)
+
+    Output:
+        results (list): one dictionary for each window, with the keys 'train' and 'test' (the first and
+            the last day of each period), 'params' (the best set of parameters) and 'result' (the tuple
+            (spent, earned, profit) of the test period)
+
+    Example:
+        A 1-year training period and a 3-month test period, moved forward every month:
+            >>> walk_forward(sim_data, 'crossing_averages', [{'n': 200, 'm': 50}, {'n': 100, 'm': 20}], 365, 90, 30)
+
+    Remark:
+        1. The indicators are calculated only once over the whole data for every set of parameters, and each
+        window uses its part of them, so the overlapping days of the windows are not calculated again. This also
+        means the indicators at the start of a window are calculated with the prices before the window.
+        2. Only the stocks which are not bankrupt on the first day of a period are traded in that period.
+        If there is none, the result of the period is (0, 0, 0), and no test ledger is kept for it.
+    '''
+    (total_period, stock) = stock_prices_data.shape
+    # Calculate the indicators of every set of parameters once over the whole data
+    requests = {}
+    for (k, p) in enumerate(params):
+        if strategy == 'crossing_averages':
+            requests[('SMA', k)] = ('moving_average', {'n': p.get('n', 200)})
+            requests[('FMA', k)] = ('moving_average', {'n': p.get('m', 50)})
+        else:
+            requests[('osc', k)] = ('oscillator', {'n': p.get('n', 7), 'osc_type': p.get('osc_type', 'stochastic')})
+    results = indicators.evaluate(stock_prices_data, requests)
+    if strategy == 'crossing_averages':
+        full_indicators = [(results[('SMA', k)], results[('FMA', k)]) for k in range(len(params))]
+    else:
+        full_indicators = [results[('osc', k)] for k in range(len(params))]
+
+    def window(start, end):
+        '''
+        Takes the price data and the indicators of the days from `start` to `end - 1`,
+        for the stocks which are not bankrupt on the day `start`.
+        '''
+        alive = np.where(np.isnan(stock_prices_data[start]) == False)[0]
+        window_data = stock_prices_data[start : end][ : , alive]
+        if strategy == 'crossing_averages':
+            window_indicators = [(SMA[start : end][ : , alive], FMA[start : end][ : , alive]) for (SMA, FMA) in full_indicators]
+        else:
+            window_indicators = [osc[start : end][ : , alive] for osc in full_indicators]
+        return (window_data, window_indicators)
+
+    # Dispatch all the windows to the processes
+    starts = list(range(0, total_period - train - test + 1, step))
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = []
+        for (k, start) in enumerate(starts):
+            (train_data, train_indicators) = window(start, start + train)
+            (test_data, test_indicators) = window(start + train, start + train + test)
+            futures.append(executor.submit(walk_forward_window, strategy, train_data, test_data, train_indicators, \
+            test_indicators, params, '{}_{}'.format(ledger, k), **kwargs))
+        # Combine the results of all the windows
+        results = []
+        for (start, future) in zip(starts, futures):
+            (best, result) = future.result()
+            results.append({'train': (start, start + train - 1), 'test': (start + train, start + train + test - 1),
+                            'params': params[best], 'result': result})
+    return results
@@ -0,0 +1,120 @@
+# Functions to build and query an aggregation cube of the traffic counts.
+import pandas as pd
+from pandas.api.types import union_categoricals
+import traffic.loader as loader
+
+# The dimensions of the cube by default
+DIMENSIONS = ['year', 'local_authority_name', 'road_name', 'hour']
+
+
+def build_cube(data, dimensions = DIMENSIONS, measures = loader.VEHICLE_COLUMNS):
+    '''
+    Builds the cube of the sums of the vehicle counts, for every combination of the dimensions which appears
+    in the data. This is the only step which scans all the rows of the data.
+
+    Input:
+        data (DataFrame): the traffic count data (e.g. from `loader.load()`)
+        dimensions (list, default DIMENSIONS): the columns to group by
+        measures (list, default loader.VEHICLE_COLUMNS): the columns to sum
+
+    Output:
+        cube (DataFrame): one row for each combination of the dimensions, with the sum of each measure
+            and the number of rows of the data in the column 'rows'
+
+    Example:
+        >>> cube = build_cube(loader.load(columns = DIMENSIONS + loader.VEHICLE_COLUMNS))
+    '''
+    grouped = data.groupby(dimensions, observed = True)
+    cube = grouped[measures].sum().astype('int64')
+    cube['rows'] = grouped.size()
+    return cube.reset_index()
+
+
+def update_cube(cube, new_data):
+    '''
+    Adds new rows of data (e.g. a new year of counts) to a cube, without scanning the old data again.
+
+    Input:
+        cube (DataFrame): the cube returned by `build_cube`
+        new_data (DataFrame): the new traffic count data, with the same dimensions and measures
+
+    Output:
+        cube (DataFrame): the updated cube
+
+    Remark:
+        The sums and the numbers of rows can simply be added together, so only the new data is grouped,
+        and the rows of the cube with the same dimensions are added to each other.
+    '''
+    measures = [column for column in cube.columns if column in loader.VEHICLE_COLUMNS]
+    dimensions = [column for column in cube.columns if column not in measures + ['rows']]
+    new_cube = build_cube(new_data, dimensions, measures)
+    # Merge the categories of the two cubes, otherwise the columns would become strings when joining them
+    for column in dimensions:
+        if isinstance(cube[column].dtype, pd.CategoricalDtype):
+            merged = union_categoricals([cube[column], new_cube[column].astype('category')]).categories
+            cube = cube.assign(**{column: cube[column].cat.set_categories(merged)})
+            new_cube[column] = new_cube[column].astype('category').cat.set_categories(merged)
+    cube = pd.concat([cube, new_cube], ignore_index = True)
+    return cube.groupby(dimensions, observed = True)[measures + ['rows']].sum().reset_index()
+
+
+def save_cube(cube, path = 'traffic_cube.parquet'):
+    '''
+    Saves the cube in a parquet file.
+    '''
+    cube.to_parquet(path, index = False)
+
+
+def load_cube(path = 'traffic_cube.parquet'):
+    '''
+    Loads the cube saved by `save_cube`.
+    '''
+    return pd.read_parquet(path)
+
+
+def query(cube, by, measures = None, where = None):
+    '''
+    Answers a roll-up query from the cube: the sums of the measures for each combination of the dimensions `by`,
+    over the rows of the cube selected by `where`.
+
+    Input:
+        cube (DataFrame): the cube returned by `build_cube`
+        by (list): the dimensions to keep, the other dimensions being summed over
+        measures (list, default None): the measures to return. If None, return all of them and 'rows'.
+        where (dict, default None): the slice of the cube to use, as {dimension: value} or
+            {dimension: list of values}
+
+    Output:
+        result (DataFrame): the sums of the measures, indexed by the dimensions `by`
+
+    Examples:
+        The total number of cars and taxis counted each year:
+            >>> query(cube, ['year'], ['cars_and_taxis'])
+
+        The number of pedal cycles counted in Fife each hour of the day, since 2010:
+            >>> query(cube, ['hour'], ['pedal_cycles'], {'local_authority_name': 'Fife', 'year': list(range(2010, 2020))})
+    '''
+    if measures is None:
+        measures = [column for column in cube.columns if column in loader.VEHICLE_COLUMNS + ['rows']]
+    if where is not None:
+        selected = pd.Series(True, index = cube.index)
+        for (dimension, value) in where.items():
+            if isinstance(value, (list, tuple, set)):
+                selected &= cube[dimension].isin(value)
+            else:
+                selected &= cube[dimension] == value
+        cube = cube[selected]
+    return cube.groupby(by, observed = True)[measures].sum()
+
+
+def share(cube, numerator, denominator, by, where = None):
+    '''
+    Calculates the share of one measure in another one (e.g. the share of HGVs in all motor vehicles)
+    for each combination of the dimensions `by`. The arguments `by` and `where` are the same as `query`.
+
+    Example:
+        The share of HGVs in each local authority each year:
+            >>> share(cube, 'all_hgvs', 'all_motor_vehicles', ['year', 'local_authority_name']).unstack()
+    '''
+    result = query(cube, by, [numerator, denominator], where)
+    return result[numerator] / result[denominator]
@@ -0,0 +1,94 @@
+# Functions to estimate the annual average daily flows and the traffic volumes.
+import traffic.loader as loader
+
+def twelve_hour_flows(data, measures = loader.VEHICLE_COLUMNS):
+    '''
+    Calculates the average 12-hour count (from 7am to 7pm) for every count point, direction, year and type
+    of vehicle, all at once with grouped operations.
+
+    Input:
+        data (DataFrame): the traffic count data (e.g. from `loader.load()`)
+        measures (list, default VEHICLE_COLUMNS): the types of vehicles
+
+    Output:
+        flows (DataFrame): one row for each (count_point_id, direction_of_travel, year), with the 12-hour
+            count of each type of vehicle, and the column `road_type` if it is in the data
+
+    Remark:
+        Like the DfT, we assume that the count performed on one day represents an average day of the year.
+        If a count point was counted on several days in the same year, the average of these days is used.
+        This is not a daily flow yet: the traffic outside the 12 hours counted is not included.
+    '''
+    counted = data[(data['hour'] >= 7) & (data['hour'] <= 18)]
+    keys = ['count_point_id', 'direction_of_travel', 'year']
+    # The 12-hour count of each day, summed over the hours
+    daily = counted.groupby(keys + ['count_date'], observed = True)[measures].sum()
+    # The average over the days counted in each year
+    flows = daily.groupby(level = keys).mean()
+    if 'road_type' in data.columns:
+        flows['road_type'] = counted.groupby(keys, observed = True)['road_type'].first()
+    return flows.reset_index()
+
+
+def aadf(data, expansion, measures = loader.VEHICLE_COLUMNS):
+    '''
+    Estimates the annual average daily flow (AADF) for every count point, direction, year and type of vehicle,
+    by expanding the 12-hour counts of `twelve_hour_flows` to the whole day.
+
+    Input:
+        data (DataFrame): the traffic count data (e.g. from `loader.load()`)
+        expansion (float or dict): the factor from the 12-hour count to the 24-hour flow, either one number for
+            all the roads, or a dictionary with one number for each `road_type` (e.g. {'Major': ..., 'Minor': ...})
+        measures (list, default VEHICLE_COLUMNS): the types of vehicles
+
+    Output:
+        flows (DataFrame): one row for each (count_point_id, direction_of_travel, year), with the AADF
+            of each type of vehicle
+
+    Remark:
+        The expansion factors are not in the data, so they have to be given, e.g. taken from the DfT
+        methodology note or estimated from automatic counters. A factor of 1 would only give the 12-hour
+        flow, which underestimates the daily flow.
+    '''
+    flows = twelve_hour_flows(data, measures)
+    if isinstance(expansion, dict):
+        # The factor of each row, according to its type of road
+        factor = flows['road_type'].map(expansion).astype(float)
+    else:
+        factor = float(expansion)
+    flows[measures] = flows[measures].mul(factor, axis = 0)
+    return flows.drop(columns = ['road_type'], errors = 'ignore')
+
+
+def vehicle_km(data, expansion, by = ['year', 'road_name'], measures = loader.VEHICLE_COLUMNS):
+    '''
+    Estimates the traffic volume (in vehicle-kilometres per year) on each road or local authority, by multiplying
+    the AADF of each link (both directions together) by its length and by the number of days in a year.
+
+    Input:
+        data (DataFrame): the traffic count data, with the columns used by `aadf` and `link_length_km`,
+            and the columns in `by`
+        expansion (float or dict): the same as `aadf`
+        by (list, default ['year', 'road_name']): the columns to group by, e.g. ['year', 'local_authority_name']
+        measures (list, default VEHICLE_COLUMNS): the types of vehicles
+
+    Output:
+        volume (DataFrame): the vehicle-kilometres of each type of vehicle, indexed by the columns `by`
+
+    Example:
+        The traffic volume of HGVs in each local authority each year, with one factor for each type of road:
+            >>> vehicle_km(data, {'Major': major_factor, 'Minor': minor_factor}, ['year', 'local_authority_name'], ['all_hgvs']).unstack()
+
+    Remark:
+        The links whose length is not known (e.g. some minor roads) are not included.
+    '''
+    flows = aadf(data, expansion, measures)
+    # Both directions of travel together give the flow on the whole link
+    link_flows = flows.groupby(['count_point_id', 'year'], observed = True)[measures].sum()
+    # The length and the other information of each link, which is the same in all its rows in a year
+    columns = ['link_length_km'] + [column for column in by if column not in ['count_point_id', 'year']]
+    links = data.groupby(['count_point_id', 'year'], observed = True)[columns].first()
+    links = links[links['link_length_km'].notna()]
+    link_flows = link_flows.join(links, how = 'inner')
+    link_flows[measures] = link_flows[measures].mul(link_flows['link_length_km'] * 365, axis = 0)
+    return link_flows.reset_index().groupby(by, observed = True)[measures].sum()
@@ -0,0 +1,133 @@
+# Functions to load the traffic count data.
+import os
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# The columns which contain the number of vehicles of each type
+VEHICLE_COLUMNS = ['pedal_cycles', 'two_wheeled_motor_vehicles', 'cars_and_taxis', 'buses_and_coaches', 'lgvs',
+                   'hgvs_2_rigid_axle', 'hgvs_3_rigid_axle', 'hgvs_3_or_4_articulated_axle', 'hgvs_4_or_more_rigid_axle',
+                   'hgvs_5_articulated_axle', 'hgvs_6_articulated_axle', 'all_hgvs', 'all_motor_vehicles']
+
+# The type of each column. The names (of roads, local authorities, ...) take few different values, so they are stored
+# as categories, and the counts of vehicles in one hour are small non-negative integers. The coordinates are signed,
+# so that the differences between them (e.g. `data.easting - 300000`) do not wrap around.
+SCHEMA = {'count_point_id': 'uint32',
+          'direction_of_travel': 'category',
+          'year': 'uint16',
+          'count_date': 'str',
+          'hour': 'uint8',
+          'region_id': 'uint8',
+          'region_name': 'category',
+          'local_authority_id': 'uint16',
+          'local_authority_name': 'category',
+          'road_name': 'category',
+          'road_type': 'category',
+          'start_junction_road_name': 'category',
+          'end_junction_road_name': 'category',
+          'easting': 'int32',
+          'northing': 'int32',
+          'latitude': 'float64',
+          'longitude': 'float64',
+          'link_length_km': 'float32',
+          'link_length_miles': 'float32'}
+SCHEMA.update({column: 'uint16' for column in VEHICLE_COLUMNS})
+
+
+
+def read_chunks(path, columns = None, chunksize = 500000):
+    '''
+    This is the generator that reads the raw counts CSV file in chunks, with the types given in `SCHEMA`,
+    and yields each chunk as a DataFrame (with the column `count_date` parsed as dates).
+    '''
+    if columns is None:
+        columns = list(SCHEMA)
+    dtype = {column: SCHEMA[column] for column in columns}
+    for chunk in pd.read_csv(path, usecols = columns, dtype = dtype, chunksize = chunksize):
+        if 'count_date' in columns:
+            chunk['count_date'] = pd.to_datetime(chunk['count_date'])
+        yield chunk[columns]
+
+
+def read_csv(path, columns = None, chunksize = 500000):
+    '''
+    Reads the raw counts CSV file in chunks, with the types given in `SCHEMA`.
+
+    Input:
+        path (str): path to the CSV file
+        columns (list, default None): the columns to read. If None, read all the columns in `SCHEMA`.
+        chunksize (int, default 500000): the number of rows read at a time
+
+    Output:
+        data (DataFrame): the traffic count data, with the column `count_date` parsed as dates
+
+    Remark:
+        Only the chunks (and not the whole file as text) are in memory while reading. The categories of
+        each chunk are different, so they are merged at the end with `union_categoricals`.
+    '''
+    if columns is None:
+        columns = list(SCHEMA)
+    chunks = list(read_chunks(path, columns, chunksize))
+    # Merge the categories of all the chunks before joining them, otherwise the columns would become strings
+    for column in columns:
+        if SCHEMA[column] == 'category':
+            merged = union_categoricals([chunk[column] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[column] = chunk[column].cat.set_categories(merged)
+    data = pd.concat(chunks, ignore_index = True)
+    return data[columns]
+
+
+def write_cache(path, cache_path, chunksize = 500000):
+    '''
+    Writes the parquet cache of the CSV file `path` chunk by chunk, so that only one chunk is in memory at a time.
+    The file is written under a temporary name first, so that an interrupted run does not leave a broken cache.
+    '''
+    # pyarrow is only needed for the cache, so the data can still be read from the CSV file without it
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    # The same types as `SCHEMA`. The categories are stored as dictionaries with indices of a fixed width,
+    # so that all the chunks have the same schema even if they do not contain the same categories.
+    schema = pa.schema([(column, pa.dictionary(pa.int32(), pa.string()) if dtype == 'category' else
+                         pa.timestamp('ns') if column == 'count_date' else pa.from_numpy_dtype(dtype))
+                        for (column, dtype) in SCHEMA.items()])
+    temporary_path = cache_path + '.tmp'
+    with pq.ParquetWriter(temporary_path, schema) as writer:
+        for chunk in read_chunks(path, None, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema = schema, preserve_index = False))
+    os.replace(temporary_path, cache_path)
+
+
+def load(path = 'dft_rawcount_region_id_3.csv', columns = None, chunksize = 500000, cache = True):
+    '''
+    Loads the traffic count data, from a parquet cache next to the CSV file if there is one.
+
+    Input:
+        path (str, default 'dft_rawcount_region_id_3.csv'): path to the CSV file
+        columns (list, default None): the columns to load. If None, load all the columns in `SCHEMA`.
+        chunksize (int, default 500000): the number of rows read at a time from the CSV file
+        cache (bool, default True): whether to use (and create) the cache
+
+    Output:
+        data (DataFrame): the traffic count data
+
+    Examples:
+        Load the whole data (the first time, this also creates 'dft_rawcount_region_id_3.parquet'):
+            >>> data = load()
+
+        Load only the columns needed for an analysis:
+            >>> data = load(columns = ['year', 'local_authority_name', 'all_hgvs', 'all_motor_vehicles'])
+
+    Remark:
+        1. The cache is a parquet file (a columnar format), so the columns not needed are not read at all.
+        It is created from all the columns of the CSV file one chunk at a time, and created again if the CSV file
+        is modified. The categories of each chunk are stored in the cache with the chunk, and they are merged when
+        the cache is read.
+        2. The parquet cache needs the package `pyarrow` to be installed, but `cache = False` does not.
+    '''
+    if not cache:
+        return read_csv(path, columns, chunksize)
+    cache_path = os.path.splitext(path)[0] + '.parquet'
+    # Create the cache if it doesn't exist or if it is older than the CSV file
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(path):
+        write_cache(path, cache_path, chunksize)
+    return pd.read_parquet(cache_path, columns = columns)
@@ -0,0 +1,100 @@
+# Functions to find the count points near a location.
+import numpy as np
+from scipy.spatial import cKDTree
+
+def build_index(data):
+    '''
+    Builds a spatial index (a k-d tree) over the locations of the count points, using their easting and northing.
+
+    Input:
+        data (DataFrame): the traffic count data, with at least the columns `count_point_id`, `easting`
+            and `northing`
+
+    Output:
+        index (dict): 'points' (a DataFrame with one row for each count point, with its coordinates and its
+            road if available) and 'tree' (the k-d tree over the easting and northing of these points)
+
+    Remark:
+        The easting and northing are coordinates in metres on a flat grid (the British National Grid), so the
+        distances between the count points are simply Euclidean distances, in metres.
+    '''
+    columns = [column for column in ['count_point_id', 'easting', 'northing', 'latitude', 'longitude', 'road_name',
+               'local_authority_name'] if column in data.columns]
+    # Each count point appears in many rows (one for each hour, direction and year), but it is indexed only once
+    points = data[columns].drop_duplicates('count_point_id').reset_index(drop = True)
+    tree = cKDTree(points[['easting', 'northing']].to_numpy(dtype = float))
+    return {'points': points, 'tree': tree}
+
+
+def within(index, locations, radius):
+    '''
+    Finds the count points within a given distance of each location.
+
+    Input:
+        index (dict): the index returned by `build_index`
+        locations (array-like): the (easting, northing) of one location, or an (N, 2) array of locations
+        radius (float): the distance (in metres)
+
+    Output:
+        result (list): for each location, an ndarray with the `count_point_id` of the points within `radius`,
+            from the closest to the furthest
+
+    Example:
+        The count points within 5 km of two locations:
+            >>> within(index, [[325000, 673000], [258000, 665000]], 5000)
+    '''
+    locations = np.atleast_2d(np.asarray(locations, dtype = float))
+    ids = index['points']['count_point_id'].to_numpy()
+    result = []
+    for (location, found) in zip(locations, index['tree'].query_ball_point(locations, radius)):
+        found = np.array(found, dtype = int)
+        # Sort the points found by their distance to the location
+        distance = np.linalg.norm(index['tree'].data[found] - location, axis = 1)
+        result.append(ids[found[np.argsort(distance)]])
+    return result
+
+
+def nearest(index, locations, k = 1):
+    '''
+    Finds the k nearest count points to each location.
+
+    Input:
+        index (dict): the index returned by `build_index`
+        locations (array-like): the (easting, northing) of one location, or an (N, 2) array of locations
+        k (int, default 1): the number of count points to find for each location
+
+    Output:
+        (ids, distance) (tuple): two (N, k) ndarrays, with the `count_point_id` of the nearest count points
+            (from the closest to the furthest) and their distances to the location (in metres)
+    '''
+    locations = np.atleast_2d(np.asarray(locations, dtype = float))
+    k = min(k, len(index['points']))
+    (distance, found) = index['tree'].query(locations, k = k)
+    ids = index['points']['count_point_id'].to_numpy()[found]
+    return (ids.reshape(len(locations), k), distance.reshape(len(locations), k))
+
+
+def time_series(data, count_point_ids, measure = 'all_motor_vehicles'):
+    '''
+    Returns the time series of the counts at some count points: the average number of vehicles counted
+    on a day, for each year and each count point.
+
+    Input:
+        data (DataFrame): the traffic count data, with the columns `count_point_id`, `year`, `count_date`
+            and `measure`
+        count_point_ids (array-like): the count points, e.g. one of the results of `within` or `nearest`
+        measure (str, default 'all_motor_vehicles'): the type of vehicles
+
+    Output:
+        series (DataFrame): one row for each year and one column for each count point (NaN for the years
+            when the count point was not counted)
+
+    Example:
+        The traffic at the count points within 5 km of a location:
+            >>> time_series(data, within(index, [325000, 673000], 5000)[0])
+    '''
+    selected = data[data['count_point_id'].isin(np.ravel(count_point_ids))]
+    # The total over all the hours and directions of each count, averaged over the days counted in each year
+    daily = selected.groupby(['count_point_id', 'year', 'count_date'], observed = True)[measure].sum()
+    yearly = daily.groupby(level = ['count_point_id', 'year']).mean()
+    return yearly.unstack('count_point_id')